@@ -0,0 +1,292 @@
+"""
+Difficulty levels of the AI opponent, from random attacks to density-optimal ones.
+Every move runs under a time budget: the density AI samples placements of the remaining fleet
+until the deadline and attacks the cell covered the most, so a move never takes much longer than the budget.
+The attacked cells are kept in an AttackedCells as the game goes, with the cells left in shuffled pools,
+so picking a cell not attacked yet takes the same time whatever the board size and however full it is.
+"""
+import random
+import time
+from components import FREE_RUN_DIRECTIONS
+from log_config import logger
+
+DEFAULT_TIME_BUDGET = 0.05
+#the density AI stops sampling early once it has this many placements
+MAX_SAMPLES = 20000
+#samples are drawn in batches between two looks at the clock
+SAMPLE_BATCH = 64
+#(row, column) steps of the directions ships are placed in, horizontal, vertical and both diagonals
+SHIP_DIRECTIONS = tuple(FREE_RUN_DIRECTIONS.values())
+#neighbours of a hit, the orthogonal ones first as most fleets are placed horizontally or vertically
+NEIGHBOURS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (-1, 1), (1, -1))
+
+class CellPool:
+    """
+    The numbers left of 0 to size - 1, to pick from at random without listing them.
+    It is a Fisher-Yates shuffle that only stores the positions it changed,
+    so picking or removing a number takes the same time whatever the size.
+    """
+    def __init__(self, size):
+        self.size = size
+        #position -> number and number -> position, for the positions whose number was moved
+        self.numbers = {}
+        self.positions = {}
+
+    def __len__(self):
+        return self.size
+
+    def pick(self):
+        """
+        Returns one of the numbers left, uniformly, without removing it.
+        """
+        position = random.randrange(self.size)
+        return self.numbers.get(position, position)
+
+    def remove(self, number):
+        """
+        Removes a number, the last number left takes its position. Numbers already removed are ignored.
+        """
+        position = self.positions.get(number, number)
+        if position >= self.size or self.numbers.get(position, position) != number:
+            return
+        last = self.size - 1
+        last_number = self.numbers.get(last, last)
+        self.numbers[position] = last_number
+        self.positions[last_number] = position
+        self.numbers.pop(last, None)
+        self.positions.pop(number, None)
+        self.size = last
+
+class AttackedCells:
+    """
+    The cells attacked on a board, in order, kept with the cells left in two pools:
+    all of them and those of the checkerboard ((x + y) even) hunted by the 'hunt' strategy.
+
+    It is used like the list of previous coordinates it replaces (append(), in, len() and iteration),
+    and should be kept for the whole game so nothing has to be rebuilt on a move.
+
+    Parameters:
+    boardsize (int): The size of the board.
+    coordinates (iterable, optional): Coordinates already attacked.
+    """
+    def __init__(self, boardsize, coordinates=()):
+        self.boardsize = boardsize
+        self.coordinates = []
+        self.cells = set()
+        self.left = CellPool(boardsize * boardsize)
+        self.checkerboard = CellPool((boardsize * boardsize + 1) // 2)
+        for cell in coordinates:
+            self.append(cell)
+
+    def append(self, coordinates):
+        """
+        Records an attack on coordinates.
+        """
+        x, y = coordinates
+        self.coordinates.append((x, y))
+        if (x, y) in self.cells or not (0 <= x < self.boardsize and 0 <= y < self.boardsize):
+            return
+        self.cells.add((x, y))
+        self.left.remove(x * self.boardsize + y)
+        if (x + y) % 2 == 0:
+            self.checkerboard.remove(self.checkerboard_number(x, y))
+
+    def __contains__(self, coordinates):
+        return tuple(coordinates) in self.cells
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def __iter__(self):
+        return iter(self.coordinates)
+
+    def remaining(self):
+        """
+        Returns the number of cells not attacked yet.
+        """
+        return len(self.left)
+
+    def random_cell(self):
+        """
+        Returns a random cell not attacked yet, None if there is none.
+        """
+        return divmod(self.left.pick(), self.boardsize) if self.left else None
+
+    def random_checkerboard_cell(self):
+        """
+        Returns a random cell of the checkerboard not attacked yet, None if there is none.
+        """
+        return self.checkerboard_cell(self.checkerboard.pick()) if self.checkerboard else None
+
+    def checkerboard_number(self, x, y):
+        """
+        Returns the number of a checkerboard cell, cells are numbered row by row.
+        """
+        if self.boardsize % 2:
+            #on an odd board, every other cell of the board is on the checkerboard
+            return (x * self.boardsize + y) // 2
+        return x * (self.boardsize // 2) + y // 2
+
+    def checkerboard_cell(self, number):
+        """
+        Returns the cell of a checkerboard number.
+        """
+        if self.boardsize % 2:
+            return divmod(2 * number, self.boardsize)
+        x, column = divmod(number, self.boardsize // 2)
+        return x, 2 * column + x % 2
+
+def attacked_cells(boardsize, previous_coordinates):
+    """
+    Returns previous_coordinates if it is an AttackedCells, otherwise an AttackedCells built from it
+    (which takes time in the number of attacks, callers should keep an AttackedCells for the game).
+    """
+    if isinstance(previous_coordinates, AttackedCells):
+        return previous_coordinates
+    return AttackedCells(boardsize, previous_coordinates)
+
+def random_unattacked(boardsize, previous_coordinates, attacked=None):
+    """
+    Picks a cell that has not been attacked before, uniformly, and appends it to previous_coordinates.
+
+    Raises:
+    ValueError: If every cell of the board has been attacked.
+    """
+    attacked = attacked_cells(boardsize, previous_coordinates) if attacked is None else attacked
+    coordinates = attacked.random_cell()
+    if coordinates is None:
+        logger.error("No coordinates left to attack")
+        raise ValueError("No coordinates left to attack")
+    previous_coordinates.append(coordinates)
+    return coordinates
+
+def random_strategy(boardsize, previous_coordinates, hits=(), remaining_ships=(), deadline=None, max_samples=None):
+    """
+    Attacks a random cell that has not been attacked before, like the AI of the game.
+    """
+    return random_unattacked(boardsize, previous_coordinates)
+
+def hunt_strategy(boardsize, previous_coordinates, hits=(), remaining_ships=(), deadline=None, max_samples=None):
+    """
+    Attacks around hits of ships not sunk yet: first the ends of a line of hits (which shows the ship's direction),
+    then the cells next to a hit, diagonal ones included as ships can be placed diagonally.
+    Otherwise attacks a random cell of a checkerboard (every horizontal or vertical ship covers at least one of them),
+    and any random cell once the checkerboard is used up.
+    """
+    attacked = attacked_cells(boardsize, previous_coordinates)
+    open_hits = set(hits)
+    for x, y in hits:
+        for row_step, column_step in SHIP_DIRECTIONS:
+            if (x + row_step, y + column_step) not in open_hits:
+                continue
+            for step in (1, -1):
+                #walking along the line of hits to the first cell that is not one
+                cell_x, cell_y = x, y
+                while (cell_x, cell_y) in open_hits:
+                    cell_x, cell_y = cell_x + step * row_step, cell_y + step * column_step
+                if 0 <= cell_x < boardsize and 0 <= cell_y < boardsize and (cell_x, cell_y) not in attacked:
+                    previous_coordinates.append((cell_x, cell_y))
+                    return cell_x, cell_y
+    for x, y in hits:
+        for row_step, column_step in NEIGHBOURS:
+            coordinates = (x + row_step, y + column_step)
+            if 0 <= coordinates[0] < boardsize and 0 <= coordinates[1] < boardsize and coordinates not in attacked:
+                previous_coordinates.append(coordinates)
+                return coordinates
+    coordinates = attacked.random_checkerboard_cell()
+    if coordinates is not None:
+        previous_coordinates.append(coordinates)
+        return coordinates
+    return random_unattacked(boardsize, previous_coordinates, attacked)
+
+def sample_placement(boardsize, ship_size, anchor=None):
+    """
+    Returns the cells of a random placement of a ship in one of SHIP_DIRECTIONS
+    (horizontal, vertical or diagonal, like the placement algorithms of components), covering anchor if given.
+    """
+    row_step, column_step = random.choice(SHIP_DIRECTIONS)
+    if anchor is None:
+        #the ship ends ship_size - 1 cells away from its first cell along every axis it moves on
+        x = random.randrange(boardsize - ship_size + 1 if row_step else boardsize)
+        if column_step == 1:
+            y = random.randrange(boardsize - ship_size + 1)
+        elif column_step == -1:
+            y = random.randrange(ship_size - 1, boardsize)
+        else:
+            y = random.randrange(boardsize)
+    else:
+        #shifting the ship along its direction so one of its cells is the anchor
+        offset = random.randrange(ship_size)
+        x, y = anchor[0] - offset * row_step, anchor[1] - offset * column_step
+    return [(x + i * row_step, y + i * column_step) for i in range(ship_size)]
+
+def density_strategy(boardsize, previous_coordinates, hits=(), remaining_ships=(), deadline=None,
+                     max_samples=MAX_SAMPLES):
+    """
+    Attacks the cell most likely to hold a ship, estimated by Monte Carlo sampling of the remaining fleet's placements.
+
+    Placements are sampled in every direction ships can be placed in, placements over misses (or sunk ships) are dropped. While there are hits of ships not sunk yet,
+    only placements through those hits are sampled and they count once per hit they cover.
+    Sampling stops at the deadline (time.perf_counter() value, None for no deadline) or after max_samples,
+    the best cell so far is attacked. Without a deadline the move only depends on the random seed.
+    Falls back to hunt_strategy if no placement was found in time.
+    """
+    attacked = attacked_cells(boardsize, previous_coordinates)
+    open_hits = set(hits)
+    ship_sizes = [int(ship_size) for ship_size in remaining_ships if 0 < int(ship_size) <= boardsize]
+    density = {}
+    samples = 0
+    max_samples = MAX_SAMPLES if max_samples is None else max_samples
+    while ship_sizes and samples < max_samples:
+        for _ in range(SAMPLE_BATCH):
+            samples = samples + 1
+            anchor = random.choice(tuple(open_hits)) if open_hits else None
+            cells = sample_placement(boardsize, random.choice(ship_sizes), anchor)
+            if any(not (0 <= x < boardsize and 0 <= y < boardsize) or ((x, y) in attacked and (x, y) not in open_hits)
+                   for x, y in cells):
+                continue
+            weight = sum(1 for cell in cells if cell in open_hits) if open_hits else 1
+            for cell in cells:
+                if cell not in attacked:
+                    density[cell] = density.get(cell, 0) + weight
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+    if not density:
+        return hunt_strategy(boardsize, previous_coordinates, hits, remaining_ships, deadline)
+    best = max(density.values())
+    coordinates = random.choice([cell for cell, weight in density.items() if weight == best])
+    previous_coordinates.append(coordinates)
+    return coordinates
+
+#strategies take the board size, the list of attacked coordinates (to append to), the hits of ships not sunk yet,
+#the sizes of the ships not sunk yet, the deadline of the move and the most placements the density AI may sample
+ATTACK_STRATEGIES = {'random': random_strategy, 'hunt': hunt_strategy, 'density': density_strategy}
+DIFFICULTY_LEVELS = {'easy': 'random', 'medium': 'hunt', 'hard': 'density'}
+
+def choose_attack(difficulty, boardsize, previous_coordinates, hits=(), remaining_ships=(),
+                  time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Generates the AI's attack for a difficulty level within a time budget.
+
+    Parameters:
+    difficulty (str): 'easy', 'medium' or 'hard'.
+    boardsize (int): The size of the board.
+    previous_coordinates (AttackedCells or list): Coordinates already attacked by the AI, the new attack is appended to it.
+    An AttackedCells kept for the game keeps the move's time independent of the board size.
+    hits (list, optional): Coordinates of the AI's hits on ships that are not sunk yet.
+    remaining_ships (list, optional): Sizes of the ships that are not sunk yet.
+    time_budget (float, optional): Seconds the move may take. Defaults to DEFAULT_TIME_BUDGET.
+
+    Returns: a tuple of coordinates for the AI's attack.
+
+    Raises:
+    ValueError: If an invalid difficulty is entered.
+    """
+    if difficulty not in DIFFICULTY_LEVELS:
+        logger.error("Invalid difficulty entered, please enter 'easy', 'medium' or 'hard'")
+        raise ValueError("Invalid difficulty entered, please enter 'easy', 'medium' or 'hard'")
+    start = time.perf_counter()
+    strategy = ATTACK_STRATEGIES[DIFFICULTY_LEVELS[difficulty]]
+    coordinates = strategy(boardsize, previous_coordinates, hits, remaining_ships, start + time_budget)
+    logger.info('%s AI attack %s chosen in %.1f ms', difficulty, coordinates, (time.perf_counter() - start) * 1000)
+    return coordinates
@@ -0,0 +1,124 @@
+"""
+Text rendering of a game board for the terminal game.
+Hits and misses are kept in an overlay next to the board instead of being written into it,
+each rendered row is cached and only the rows that changed are rendered again,
+and streams (the terminal game or spectators) are only sent the rows that changed.
+"""
+from log_config import logger
+
+HIT_MARKER = ' [X] '
+MISS_MARKER = ' [O] '
+EMPTY_CELL = '  '
+CELL_SEPARATOR = '  '
+
+def render_cell(cell, marker):
+    """
+    Returns the text of one cell, the hit/miss marker wins over what is on the board.
+    """
+    if marker is not None:
+        return marker
+    return EMPTY_CELL if cell is None else cell
+
+class BoardRenderer:
+    """
+    Renders a board and its hit/miss overlay, caching the text of every row.
+
+    Parameters:
+    board (list): A 2D list representing the game board, it is only read.
+    """
+    def __init__(self, board):
+        self.board = board
+        self.overlay = [[None] * len(row) for row in board]
+        self.rows = [None] * len(board)
+        #incremented every time a row is rendered again, so streams know what changed
+        self.row_versions = [0] * len(board)
+        self.dirty = set(range(len(board)))
+
+    def mark(self, x, y, hit):
+        """
+        Marks the cell (x, y) as hit or missed in the overlay, the board itself is not changed.
+        """
+        self.overlay[x][y] = HIT_MARKER if hit else MISS_MARKER
+        self.dirty.add(x)
+
+    def invalidate_row(self, x):
+        """
+        Marks row x to be rendered again, to be called when the board changed outside of mark().
+        """
+        self.dirty.add(x)
+
+    def refresh(self):
+        """
+        Renders again only the rows that changed and returns their indexes.
+        """
+        changed = sorted(self.dirty)
+        for x in changed:
+            self.rows[x] = CELL_SEPARATOR.join(render_cell(cell, marker)
+                                               for cell, marker in zip(self.board[x], self.overlay[x]))
+            self.row_versions[x] = self.row_versions[x] + 1
+        self.dirty.clear()
+        return changed
+
+    def render(self):
+        """
+        Returns the board as text, rows are separated by new lines.
+        """
+        self.refresh()
+        return '\n'.join(self.rows)
+
+class SpectatorStream:
+    """
+    Writes a board to a spectator's stream (anything with write() and flush()), sending only the rows that changed.
+
+    Parameters:
+    renderer (BoardRenderer): The renderer of the board being watched.
+    stream: The stream to write to.
+    ansi (bool, optional): Redraw rows in place with ANSI cursor moves (for terminals, see pin()),
+    otherwise every changed row is written as 'row:text' on its own line. Defaults to False.
+    """
+    def __init__(self, renderer, stream, ansi=False):
+        self.renderer = renderer
+        self.stream = stream
+        self.ansi = ansi
+        self.seen = [None] * len(renderer.rows)
+
+    def pin(self):
+        """
+        Clears the terminal and keeps the board in its top rows (ansi streams only),
+        text written to the stream after it scrolls below the board without moving it.
+        """
+        below = len(self.seen) + 2
+        #the scroll region starts under the board and setting it moves the cursor home, so it is moved back under the board
+        self.stream.write(f"\x1b[2J\x1b[{below};r\x1b[{below};1H")
+        self.stream.flush()
+
+    def unpin(self):
+        """
+        Gives the whole terminal back for scrolling, the cursor stays where it is.
+        """
+        self.stream.write("\x1b7\x1b[r\x1b8")
+        self.stream.flush()
+
+    def write(self):
+        """
+        Writes the rows changed since the last write (all of them the first time) and returns how many were written.
+        """
+        self.renderer.refresh()
+        written = 0
+        if self.ansi:
+            #the cursor is saved and restored, so the text below the board carries on where it was
+            self.stream.write("\x1b7")
+        for x, version in enumerate(self.renderer.row_versions):
+            if self.seen[x] == version:
+                continue
+            if self.ansi:
+                self.stream.write(f"\x1b[{x + 1};1H{self.renderer.rows[x]}\x1b[K")
+            else:
+                self.stream.write(f"{x}:{self.renderer.rows[x]}\n")
+            self.seen[x] = version
+            written = written + 1
+        if self.ansi:
+            self.stream.write("\x1b8")
+        self.stream.flush()
+        logger.info("%s rows streamed to spectator", written)
+        return written
@@ -4,6 +4,7 @@ componenets for game functionality
 """
 import json
 import random
+from collections import Counter
 from log_config import logger
 
 def initialise_board(board_size=10):
@@ -102,37 +103,36 @@ def place_battleships(board, ships, algorithm='simple'):
         #lengths for the board
         horizontal_len = len(board[0])
         vertical_len = len(board)
+        #free-run tables tell in a single lookup whether a ship fits, and are updated as ships are placed
+        free_runs = build_free_runs(board, ('h', 'v'), cap=max(ships.values(), default=1))
         #iterating ships dictionary to extract the ship_name and ship_size and allocate them on the board
-        #ship_name being the key and ship_size beinf the value
         for ship_name, ship_size in ships.items():
             #ship_name being the key and ship_size beinf the value
             ship_length = int(ship_size)
-            placed = False
-            #Keep trying to place the ship until it is successfully placed
-            while not placed:
-                #Randomly choosing the orientation of the ship
+            #If there is nowhere left for the ship, fail straight away instead of retrying forever
+            if count_legal_positions(free_runs, ship_length) == 0:
+                logger.error("Not all ships were placed")
+                raise PlacementError("Not all ships could be placed on the board")
+            position = None
+            #Random draws checked with a single lookup each, like empty_check used to do
+            for _ in range(MAX_RANDOM_DRAWS):
                 orientation = random.choice(['h', 'v'])
-                if orientation == 'h':
-                    #Random Coordinates for the ship to be placed at.
-                    x = random.randint(0, horizontal_len - ship_length)  
-                    y = random.randint(0, vertical_len - 1) 
-                    #Checking if the position is empty for the ship to be placed through an additional function
-                    if empty_check(board, y, x, ship_length, orientation): 
-                        #If it is, place the ship on the board
-                        for i in range(ship_length):
-                            board[y][x+i] = ship_name 
-                        placed = True
+                if orientation == 'h' and ship_length <= horizontal_len:
+                    y = random.randint(0, vertical_len - 1)
+                    x = random.randint(0, horizontal_len - ship_length)
+                elif orientation == 'v' and ship_length <= vertical_len:
+                    y = random.randint(0, vertical_len - ship_length)
+                    x = random.randint(0, horizontal_len - 1)
                 else:
-                    x = random.randint(0, horizontal_len - 1) 
-                    y = random.randint(0, vertical_len - ship_length)  
-                    if empty_check(board, y, x, ship_length, orientation):  
-                        for i in range(ship_length):
-                            board[y+i][x] = ship_name  
-                        placed = True
-        #If a ship could not be placed, raise an exception
-        if placed is False:
-            logger.error("Not all ships were placed")
-            raise PlacementError("Not all ships could be placed on the board")
+                    continue
+                if ship_fits(free_runs, y, x, ship_length, orientation):
+                    position = (y, x, orientation)
+                    break
+            #On a crowded board, pick among the few positions left instead of drawing forever
+            if position is None:
+                position = random.choice([(x, y, orientation) for orientation in ('h', 'v')
+                                          for x, y in legal_positions(free_runs, ship_length, orientation)])
+            place_ship_cells(board, free_runs, ship_name, position[0], position[1], ship_length, position[2])
         #Return the updated board
         logger.info('Battleships placed successfully')
         return board
@@ -192,38 +192,31 @@ def place_battleships(board, ships, algorithm='simple'):
 
     elif algorithm == 'diagonal':
         logger.info('Placing battleships on the board using diagonal algorithm')
-        #same as random, just placememt is diagonal
-        #Get the horizontal and vertical lengths of the board
-        horizontal_len = len(board)
-        vertical_len   = len(board[0])
+        #same as random, just placememt is diagonal, leftwards or rightwards
+        free_runs = build_free_runs(board, ('left', 'right'), cap=max(ships.values(), default=1))
         #Loop through each ship in the ships dictionary
+        horizontal_len = len(board)
+        vertical_len = len(board[0])
         for ship_name, ship_size in ships.items():
-            placed = False
-            #Keep trying to place the ship until it is successfully placed
-            while placed is False:
+            #If a ship could not be placed, raise an error.
+            if count_legal_positions(free_runs, ship_size) == 0:
                 logger.error("All the battleship_names could not be placed on the board")
+                raise PlacementError("Not all ships could be placed on the board")
+            position = None
+            for _ in range(MAX_RANDOM_DRAWS):
                 orientation = random.choice(['left', 'right'])
+                x = random.randint(0, horizontal_len - ship_size)
                 if orientation == 'left': #placing the ships diagonally but leftwards
-                    x = random.randint(0, horizontal_len - ship_size)
                     y = random.randint(0, vertical_len - ship_size)
-                    #Check if the chosen position is empty
-                    if empty_check_diagonal(board, x, y, ship_size, orientation) is True:
-                        for i in range(ship_size):
-                            #If it is, place the ship on the board
-                            board[x+i][y+i] = ship_name
-                        placed = True
                 else:  #placing the ships diagonally but rightwards
-                    x = random.randint(0, horizontal_len - ship_size)
                     y = random.randint(ship_size - 1, vertical_len - 1)
-                    #Check if the chosen position is empty
-                    if empty_check_diagonal(board, x, y, ship_size, orientation) is True:
-                        for i in range(ship_size):
-                            #If it is, place the ship on the board
-                            board[x+i][y-i] = ship_name
-                        placed = True
-            #If a ship could not be placed, return an error message.            
-            if placed is False:
-                raise PlacementError("Not all ships could be placed on the board")
+                if ship_fits(free_runs, x, y, ship_size, orientation):
+                    position = (x, y, orientation)
+                    break
+            if position is None:
+                position = random.choice([(x, y, orientation) for orientation in ('left', 'right')
+                                          for x, y in legal_positions(free_runs, ship_size, orientation)])
+            place_ship_cells(board, free_runs, ship_name, position[0], position[1], ship_size, position[2])
         # Return the updated board
         logger.info('Battleships placed successfully')
         return board
@@ -278,6 +271,127 @@ def empty_check_diagonal(board, x, y, ship_size, orientation):
                 return False
     return True
 
+#(row, column) step of each direction a ship can be placed in
+FREE_RUN_DIRECTIONS = {'h': (0, 1), 'v': (1, 0), 'left': (1, 1), 'right': (1, -1)}
+#random draws tried for a ship before falling back to listing every legal position
+MAX_RANDOM_DRAWS = 100
+
+def empty_free_run(direction, rows, columns, x, y):
+    """
+    Returns the number of cells from (x, y) to the edge of an empty board in the direction.
+    """
+    if direction == 'h':
+        return columns - y
+    if direction == 'v':
+        return rows - x
+    if direction == 'left':
+        return min(rows - x, columns - y)
+    return min(rows - x, y + 1)
+
+def build_free_runs(board, directions=tuple(FREE_RUN_DIRECTIONS), cap=None):
+    """
+    Builds the free-run tables of a board.
+
+    A free run is the number of empty cells starting at a cell and going in a direction (0 if the cell is taken),
+    a ship of length L fits at (x, y) if it is >= L. Runs are capped at cap, so updates only walk back cap cells,
+    and only the cells that differ from an empty board are stored, so building is quick on a mostly empty board.
+
+    Parameters:
+    board (list): A 2D list representing the game board.
+    directions (tuple, optional): The directions to build tables for, keys of FREE_RUN_DIRECTIONS. Defaults to all of them.
+    cap (int, optional): The longest ship the tables are asked about. Defaults to the size of the board.
+
+    Returns:
+    dict: The tables, to be used with update_free_runs, ship_fits, legal_positions and count_legal_positions.
+    """
+    rows = len(board)
+    columns = len(board[0])
+    free_runs = {'rows': rows, 'columns': columns, 'cap': cap or max(rows, columns),
+                 #runs that differ from an empty board, and how many cells of each run length were changed
+                 'runs': {direction: {} for direction in directions},
+                 'counts': {direction: Counter() for direction in directions}}
+    for x, row in enumerate(board):
+        if row.count(None) != columns:
+            for y, cell in enumerate(row):
+                if cell is not None:
+                    update_free_runs(free_runs, board, x, y)
+    return free_runs
+
+def free_run(free_runs, x, y, direction):
+    """
+    Returns the (capped) free run at (x, y) in the direction.
+    """
+    run = free_runs['runs'][direction].get((x, y))
+    if run is None:
+        run = min(empty_free_run(direction, free_runs['rows'], free_runs['columns'], x, y), free_runs['cap'])
+    return run
+
+def update_free_runs(free_runs, board, x, y):
+    """
+    Updates the free-run tables after the cell (x, y) of the board has been taken.
+    Only the cells of the runs that ended at (x, y) are changed, and the walk stops as soon as a run is unchanged.
+    """
+    rows = free_runs['rows']
+    columns = free_runs['columns']
+    cap = free_runs['cap']
+    for direction, runs in free_runs['runs'].items():
+        counts = free_runs['counts'][direction]
+        row_step, column_step = FREE_RUN_DIRECTIONS[direction]
+        counts[free_run(free_runs, x, y, direction)] -= 1
+        counts[0] += 1
+        runs[(x, y)] = 0
+        next_run = 0
+        #the empty cells before (x, y) now stop one cell earlier
+        previous_x, previous_y = x - row_step, y - column_step
+        while 0 <= previous_x < rows and 0 <= previous_y < columns and board[previous_x][previous_y] is None:
+            old_run = free_run(free_runs, previous_x, previous_y, direction)
+            next_run = min(next_run + 1, cap)
+            if old_run == next_run:
+                break
+            counts[old_run] -= 1
+            counts[next_run] += 1
+            runs[(previous_x, previous_y)] = next_run
+            previous_x, previous_y = previous_x - row_step, previous_y - column_step
+
+def ship_fits(free_runs, x, y, ship_size, direction):
+    """
+    Returns True if a ship of ship_size fits at (x, y) in the direction, looked up in the free-run tables.
+    """
+    return free_run(free_runs, x, y, direction) >= ship_size
+
+def legal_positions(free_runs, ship_size, direction):
+    """
+    Returns a list of every (x, y) a ship of ship_size can be placed at in the direction (checks every cell).
+    """
+    return [(x, y) for x in range(free_runs['rows']) for y in range(free_runs['columns'])
+            if free_run(free_runs, x, y, direction) >= ship_size]
+
+def count_legal_positions(free_runs, ship_size):
+    """
+    Returns the number of legal positions of a ship of ship_size (up to the cap) over all the directions in the tables,
+    from the positions of an empty board and the run length counts, without going through the cells.
+    0 means the ship cannot be placed anymore.
+    """
+    rows = free_runs['rows']
+    columns = free_runs['columns']
+    empty_positions = {'h': rows * max(columns - ship_size + 1, 0),
+                       'v': max(rows - ship_size + 1, 0) * columns}
+    empty_positions['left'] = empty_positions['right'] = max(rows - ship_size + 1, 0) * max(columns - ship_size + 1, 0)
+    total = 0
+    for direction, counts in free_runs['counts'].items():
+        #every cell whose run fell below ship_size from at least ship_size is one position less
+        total = total + empty_positions[direction] + sum(count for run, count in counts.items() if run >= ship_size)
+    return total
+
+def place_ship_cells(board, free_runs, ship_name, x, y, ship_size, direction):
+    """
+    Writes a ship on the board starting at (x, y) in the direction and updates the free-run tables.
+    """
+    row_step, column_step = FREE_RUN_DIRECTIONS[direction]
+    for i in range(ship_size):
+        board[x + i * row_step][y + i * column_step] = ship_name
+        update_free_runs(free_runs, board, x + i * row_step, y + i * column_step)
+
 def end_game_check(ships):
     """
     Checks if all ships have been sunk to end the game.
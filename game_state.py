@@ -0,0 +1,125 @@
+"""
+Versioned game state for the web game.
+Every move bumps the version and stores a small delta (changed cells and sunk ships),
+so the front end can be sent just what changed instead of the whole board.
+"""
+import uuid
+from game_engine import attack
+from log_config import logger
+
+def tracked_attack(coordinates, board, ships):
+    """
+    Performs an attack through attack() and reports what changed on the board.
+
+    Parameters:
+    coordinates: Tuple of x and y coordinates of the attack.
+    board: 2D list representing the game board.
+    ships: Dictionary representing the ships. The keys are the ship names and the values are the ship sizes.
+
+    Returns:
+    tuple: (hit, cell, sunk) where hit is the result of attack(), cell is the attacked (x, y) as integers
+    (None if the coordinates were invalid) and sunk is the name of the ship sunk by this attack or None.
+    """
+    try:
+        cell = (int(coordinates[0]), int(coordinates[1]))
+        ship_name = board[cell[0]][cell[1]]
+    except (IndexError, ValueError, TypeError):
+        #invalid coordinates, attack() reports the problem itself
+        return attack(coordinates, board, ships), None, None
+    hit = attack(coordinates, board, ships)
+    sunk = ship_name if hit and ships.get(ship_name) == 0 else None
+    return hit, cell, sunk
+
+class GameState:
+    """
+    Keeps the version number, the attacked cells of both boards and a bounded history of deltas.
+
+    Each delta is a dictionary with the version it produced, the changed cells
+    ({'board': 'ai' or 'player', 'x', 'y', 'hit'}), the ships sunk by the move and the result of the game (if finished).
+    """
+    def __init__(self, history_limit=256):
+        self.history_limit = history_limit
+        self.reset()
+
+    def reset(self):
+        """
+        Starts a new game, the game id changes so ETags of the previous game are not reused.
+        """
+        self.game_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        self.history = []
+        self.cells = {'ai': {}, 'player': {}}
+        self.sunk = {'ai': [], 'player': []}
+        self.finished = None
+        logger.info("Game state reset, game id %s", self.game_id)
+
+    def record_move(self, changes, sunk=None, finished=None):
+        """
+        Records a move and returns its delta.
+
+        Parameters:
+        changes (list): Tuples of (board, cell, hit), board being 'ai' or 'player'. Entries with cell None are skipped.
+        sunk (list, optional): Tuples of (board, ship_name) for the ships sunk by this move.
+        finished (str, optional): Message for the end of the game.
+
+        Returns:
+        dict: The delta of this move.
+        """
+        self.version = self.version + 1
+        delta = {'version': self.version, 'changes': [], 'sunk': [], 'finished': finished}
+        for board, cell, hit in changes:
+            if cell is None:
+                continue
+            #a repeated attack on a hit cell comes back as a miss, the first result is the one that counts
+            #and the delta carries it too, so replaying deltas gives the same board as the full state
+            hit = self.cells[board].setdefault(cell, hit)
+            delta['changes'].append({'board': board, 'x': cell[0], 'y': cell[1], 'hit': hit})
+        for board, ship_name in sunk or []:
+            self.sunk[board].append(ship_name)
+            delta['sunk'].append({'board': board, 'ship': ship_name})
+        if finished is not None:
+            self.finished = finished
+        self.history.append(delta)
+        #only the latest deltas are kept, older clients get the full state instead
+        if len(self.history) > self.history_limit:
+            del self.history[:len(self.history) - self.history_limit]
+        return delta
+
+    def deltas_since(self, since):
+        """
+        Returns the deltas recorded after version since, or None if they are no longer
+        (or not yet) available and the full state has to be fetched.
+        """
+        if since > self.version or since < 0:
+            return None
+        if since == self.version:
+            return []
+        if not self.history or self.history[0]['version'] > since + 1:
+            return None
+        return [delta for delta in self.history if delta['version'] > since]
+
+    def etag(self):
+        """
+        Returns the ETag of the current full state.
+        """
+        return f"{self.game_id}-{self.version}"
+
+    def full_state(self, player_board):
+        """
+        Returns the full state of the game with the player's board.
+
+        Parameters:
+        player_board: 2D list representing the player's game board.
+
+        Returns:
+        dict: version, player's board, attacked cells of both boards, sunk ships and the result of the game.
+        """
+        return {
+            'game_id': self.game_id,
+            'version': self.version,
+            'player_board': player_board,
+            'cells': {board: [{'x': cell[0], 'y': cell[1], 'hit': hit} for cell, hit in cells.items()]
+                      for board, cells in self.cells.items()},
+            'sunk': self.sunk,
+            'finished': self.finished,
+        }
@@ -0,0 +1,367 @@
+"""
+Load generator for the web game in main.py.
+Simulates concurrent players going through /placement -> / -> /attack with asyncio,
+either against a running server (through a pool of HTTP connections) or against Flask's test client,
+and reports throughput, latency percentiles, errors and cross-game state corruption.
+
+Usage: python load_test.py --players 1000 --rate 50 --concurrency 100 [--difficulty hard] [--url http://127.0.0.1:5000]
+"""
+import argparse
+import asyncio
+import contextlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+from components import initialise_board, create_battleships, place_battleships, PlacementError
+from mp_game_engine import generate_attack
+from ai_difficulty import DIFFICULTY_LEVELS
+from log_config import logger
+
+class HttpTransport:
+    """
+    Sends requests to a running server through a fixed pool of keep-alive HTTP connections.
+    """
+    def __init__(self, url, pool_size=50, timeout=10):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.connections = None
+
+    async def start(self):
+        """
+        Fills the connection pool, has to be called inside the running event loop.
+        """
+        self.connections = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self.connections.put_nowait(self.connect())
+
+    def connect(self):
+        """
+        Returns a new (not yet opened) connection to the server.
+        """
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def send(self, connection, method, path, body):
+        """
+        Sends one request on a connection (runs in the executor)
+        and returns (status, json body or None, seconds taken by the request).
+        """
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+            elapsed = time.perf_counter() - start
+        except (http.client.HTTPException, OSError):
+            #the connection is broken, close it so the next request reconnects
+            connection.close()
+            raise
+        try:
+            return response.status, json.loads(data), elapsed
+        except ValueError:
+            return response.status, None, elapsed
+
+    async def request(self, method, path, body=None):
+        """
+        Sends a request with a connection taken from the pool.
+
+        Returns:
+        tuple: (status, json body or None, seconds taken by the request).
+        The time spent waiting for a free connection or thread is not counted, it is not the server's latency.
+        """
+        connection = await self.connections.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.send,
+                                                                    connection, method, path, body)
+        except asyncio.CancelledError:
+            #the executor thread may still be using the connection, it is dropped and replaced by a new one
+            connection.close()
+            connection = self.connect()
+            raise
+        finally:
+            self.connections.put_nowait(connection)
+
+    def close(self):
+        """
+        Closes the connections of the pool.
+        """
+        while self.connections is not None and not self.connections.empty():
+            self.connections.get_nowait().close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class TestClientTransport:
+    """
+    Sends requests to Flask's test client of main.app from a pool of threads, without a server.
+    """
+    def __init__(self, pool_size=50):
+        from main import app
+        self.app = app
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    async def start(self):
+        """
+        Nothing to open for the test client.
+        """
+
+    def send(self, method, path, body):
+        """
+        Sends one request with the test client of the current thread
+        and returns (status, json body or None, seconds taken by the request).
+        """
+        if not hasattr(self.local, 'client'):
+            self.local.client = self.app.test_client()
+        start = time.perf_counter()
+        response = self.local.client.open(path, method=method, json=body)
+        return response.status_code, response.get_json(silent=True), time.perf_counter() - start
+
+    async def request(self, method, path, body=None):
+        """
+        Sends a request from the thread pool, the time waiting for a free thread is not counted.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.send, method, path, body)
+
+    def close(self):
+        """
+        Stops the thread pool.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class LoadStats:
+    """
+    Collects the latencies, errors and corruptions seen by the simulated players.
+    """
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.corruptions = {}
+        self.examples = []
+        self.games_finished = 0
+
+    def record(self, endpoint, elapsed):
+        """
+        Records the latency of a request to an endpoint.
+        """
+        self.latencies.setdefault(endpoint, []).append(elapsed)
+
+    def error(self, endpoint, reason):
+        """
+        Records a failed request to an endpoint.
+        """
+        key = f"{endpoint}: {reason}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    def corruption(self, kind, detail):
+        """
+        Records state that does not belong to the player's own game.
+        """
+        self.corruptions[kind] = self.corruptions.get(kind, 0) + 1
+        if len(self.examples) < 10:
+            self.examples.append(f"{kind}: {detail}")
+
+    def report(self, wall_time, players):
+        """
+        Returns the report as a dictionary: throughput, latency percentiles (ms) per endpoint, error rate and corruptions.
+        """
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[endpoint] = {'requests': len(values), **{f"p{p}": round(percentile(values, p) * 1000, 2)
+                                                              for p in (50, 90, 99)}}
+        return {
+            'players': players,
+            'games_finished': self.games_finished,
+            'wall_time_s': round(wall_time, 2),
+            'requests': total,
+            'throughput_rps': round(total / wall_time, 1) if wall_time > 0 else 0.0,
+            'error_rate': round(errors / max(total, 1), 4),
+            'errors': self.errors,
+            'corruptions': self.corruptions,
+            'corruption_examples': self.examples,
+            'latency_ms': endpoints,
+        }
+
+def percentile(sorted_values, p):
+    """
+    Returns the nearest-rank p-th percentile of a sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def random_placement(board_size, ships):
+    """
+    Places the ships randomly and returns (board, placement), placement being the JSON posted to /placement.
+    """
+    board = initialise_board(board_size)
+    place_battleships(board, dict(ships), algorithm='random')
+    cells = {}
+    for x, row in enumerate(board):
+        for y, ship_name in enumerate(row):
+            if ship_name is not None:
+                cells.setdefault(ship_name, []).append((x, y))
+    placement = {}
+    for ship_name, ship_cells in cells.items():
+        x, y = min(ship_cells)
+        orientation = 'h' if all(cell[0] == x for cell in ship_cells) else 'v'
+        #custom_placement in main.py reads the column first and the row second
+        placement[ship_name] = [str(y), str(x), orientation]
+    return board, placement
+
+def sweep_attack(board_size, previous_coordinates):
+    """
+    Attack strategy of a player going through the board row by row.
+    """
+    coordinates = divmod(len(previous_coordinates), board_size)
+    previous_coordinates.append(coordinates)
+    return coordinates
+
+PLAYER_STRATEGIES = {'random': generate_attack, 'sweep': sweep_attack}
+
+async def play_game(transport, stats, ships, board_size=10, max_moves=None, strategy='random', timeout=10.0,
+                    difficulty=None, ai_placement=None):
+    """
+    Plays one game as a simulated player and checks every response against the player's own game.
+    difficulty and ai_placement choose the AI of the game (the server's current ones if None).
+
+    Corruption is recorded when the board returned by /state is not the one that was placed,
+    when the state version does not move by exactly one per move,
+    or when the AI's move reported in the delta does not match the player's board.
+    A request taking longer than timeout seconds is recorded as a 'timeout' error and ends the game.
+    """
+    async def timed(endpoint, method, path, body=None):
+        try:
+            status, data, elapsed = await asyncio.wait_for(transport.request(method, path, body), timeout)
+        except asyncio.TimeoutError:
+            stats.error(endpoint, 'timeout')
+            return None
+        except Exception as e:  # pylint: disable=broad-except
+            stats.error(endpoint, type(e).__name__)
+            return None
+        stats.record(endpoint, elapsed)
+        if status >= 400:
+            stats.error(endpoint, f"HTTP {status}")
+            return None
+        return data if data is not None else {}
+
+    try:
+        expected_board, placement = random_placement(board_size, ships)
+    except PlacementError:
+        stats.error('setup', 'PlacementError')
+        return
+    await timed('GET /placement', 'GET', '/placement')
+    ai = {key: value for key, value in (('difficulty', difficulty), ('ai_placement', ai_placement)) if value is not None}
+    path = '/placement?' + urlencode(ai) if ai else '/placement'
+    if await timed('POST /placement', 'POST', path, placement) is None:
+        return
+    await timed('GET /', 'GET', '/')
+    state = await timed('GET /state', 'GET', '/state')
+    if state is None:
+        return
+    if state.get('player_board') != expected_board:
+        stats.corruption('board_mismatch', f"game {state.get('game_id')} returned another player's board")
+    version = state.get('version', 0)
+    attacked = []
+    ai_moves = set()
+    choose = PLAYER_STRATEGIES[strategy]
+    for _ in range(min(max_moves or board_size * board_size, board_size * board_size)):
+        x, y = choose(board_size, attacked)
+        result = await timed('GET /attack', 'GET', '/attack?' + urlencode({'x': x, 'y': y}))
+        if result is None:
+            return
+        if result.get('version') != version + 1:
+            stats.corruption('version_skew', f"expected version {version + 1}, got {result.get('version')}")
+        version = result.get('version', version)
+        ai_turn = tuple(result.get('AI_Turn', ()))
+        if ai_turn in ai_moves:
+            stats.corruption('repeated_ai_move', f"AI attacked {ai_turn} twice")
+        ai_moves.add(ai_turn)
+        for change in result.get('changes', []):
+            if change['board'] == 'player':
+                cell_x, cell_y = change['x'], change['y']
+                expected_hit = expected_board[cell_x][cell_y] is not None
+                if change['hit'] != expected_hit:
+                    stats.corruption('foreign_ai_hit', f"AI {'hit' if change['hit'] else 'missed'} at {(cell_x, cell_y)}")
+                expected_board[cell_x][cell_y] = None
+        if 'finished' in result:
+            stats.games_finished = stats.games_finished + 1
+            return
+
+async def run_load(transport, players=100, rate=20.0, concurrency=50, board_size=10, max_moves=None,
+                   strategy='random', ships=None, timeout=10.0, difficulty=None, ai_placement=None):
+    """
+    Starts players at a Poisson arrival rate (players per second), with at most concurrency games at a time,
+    and returns the report of LoadStats. Every request is given up after timeout seconds.
+    difficulty and ai_placement are posted with every placement to choose the AI played against.
+    """
+    stats = LoadStats()
+    ships = ships if ships is not None else create_battleships()
+    limit = asyncio.Semaphore(concurrency)
+    await transport.start()
+
+    async def player():
+        async with limit:
+            await play_game(transport, stats, ships, board_size, max_moves, strategy, timeout, difficulty, ai_placement)
+
+    start = time.perf_counter()
+    tasks = []
+    for _ in range(players):
+        tasks.append(asyncio.create_task(player()))
+        if rate > 0:
+            await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    wall_time = time.perf_counter() - start
+    transport.close()
+    return stats.report(wall_time, players)
+
+def main():
+    """
+    Parses the command line, runs the load and prints the report as JSON (or writes it to --output).
+    The game's own prints are silenced during the load, so the report is the only output.
+    """
+    parser = argparse.ArgumentParser(description="Load generator for the Battleship web game")
+    parser.add_argument('--url', help="base URL of a running server, Flask's test client is used if omitted")
+    parser.add_argument('--players', type=int, default=100, help="number of simulated players")
+    parser.add_argument('--rate', type=float, default=20.0, help="player arrival rate per second, 0 starts all at once")
+    parser.add_argument('--concurrency', type=int, default=50, help="maximum number of games played at the same time")
+    parser.add_argument('--pool-size', type=int, default=50, help="number of HTTP connections / client threads")
+    parser.add_argument('--moves', type=int, default=None, help="maximum attacks per game, whole board if omitted")
+    parser.add_argument('--strategy', choices=sorted(PLAYER_STRATEGIES), default='random', help="attack strategy of the players")
+    parser.add_argument('--difficulty', choices=sorted(DIFFICULTY_LEVELS), default=None,
+                        help="difficulty of the AI played against, the server's current one if omitted")
+    parser.add_argument('--ai-placement', choices=['simple', 'random', 'diagonal'], default=None,
+                        help="placement algorithm of the AI's ships, the server's current one if omitted")
+    parser.add_argument('--timeout', type=float, default=10.0, help="timeout of every request in seconds")
+    parser.add_argument('--output', help="file to write the JSON report to, printed if omitted")
+    args = parser.parse_args()
+    if args.url:
+        transport = HttpTransport(args.url, pool_size=args.pool_size, timeout=args.timeout)
+    else:
+        transport = TestClientTransport(pool_size=args.pool_size)
+    logger.info("Starting load of %s players", args.players)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        report = asyncio.run(run_load(transport, args.players, args.rate, args.concurrency,
+                                      max_moves=args.moves, strategy=args.strategy, timeout=args.timeout,
+                                      difficulty=args.difficulty, ai_placement=args.ai_placement))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        logger.info("Report written to %s", args.output)
+    else:
+        print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
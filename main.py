@@ -3,8 +3,8 @@ main entry point to our project
 """
 from flask import Flask, render_template, request, jsonify
 from components import initialise_board, create_battleships, place_battleships, end_game_check
-from game_engine import attack
-from mp_game_engine import generate_attack
+from ai_difficulty import choose_attack, AttackedCells, DIFFICULTY_LEVELS
+from game_state import GameState, tracked_attack
 from log_config import logger
 
 app = Flask(__name__)
@@ -13,6 +13,14 @@ ai_board = []
 ai_ships = {}
 user_ships = {}
 PLACEMENT = None
+GAME_STATE = GameState()
+DIFFICULTY = 'easy'
+AI_PLACEMENT = 'random'
+#'custom' reads the terminal game's placement.json, so it is not offered to the web AI
+AI_PLACEMENTS = ('simple', 'random', 'diagonal')
+#sizes of the user's ships when placed, and the AI's hits on them by coordinates
+user_fleet = {}
+ai_hits = {}
 
 def custom_placement(board, ships):
     """
@@ -78,19 +86,33 @@ def placement_interface():
     For POST requests, it initializes the user's game board, 
     gets the placement from the request's JSON, places the ships on the board using the 'custom_placement' function,
     and returns a JSON response indicating that the placement was received.
+    The optional 'difficulty' ('easy', 'medium' or 'hard') and 'ai_placement' ('simple', 'random' or 'diagonal')
+    URL arguments of the POST request choose the AI of the game.
 
     Global variables:
     user_board: 2D list representing the user's game board
     user_ships: Dictionary representing the user's battleships
     placement: Dictionary representing the placement of the user's battleships
+    DIFFICULTY: The AI's difficulty level
+    AI_PLACEMENT: The placement algorithm of the AI's battleships
+    user_fleet: Dictionary of the sizes of the user's battleships
+    previous_coords: AttackedCells of the AI's attacks, emptied for the new placement
+    ai_hits: Dictionary of the AI's hits, emptied for the new placement
+    GAME_STATE: The versioned state of the game, reset for the new placement
 
     Returns:
     For GET requests: Rendered 'placement.html' template with the user's ships and board size.
-    For POST requests: JSON response with a message indicating that the placement was received.
+    For POST requests: JSON response with a message indicating that the placement was received,
+    or an error message if the difficulty or AI placement is invalid.
     """
     global user_board
     global user_ships
     global PLACEMENT
+    global DIFFICULTY
+    global AI_PLACEMENT
+    global user_fleet
+    global previous_coords
+    global ai_hits
     user_ships = create_battleships()
     if request.method == 'GET':
         #return placement.html with get request
@@ -98,12 +120,25 @@ def placement_interface():
         return render_template('placement.html', ships = user_ships, board_size = 10)
         #ininialise board, and placing ships as per user's custom placement
     elif request.method == 'POST':
+        difficulty = request.args.get('difficulty', DIFFICULTY)
+        ai_placement = request.args.get('ai_placement', AI_PLACEMENT)
+        if difficulty not in DIFFICULTY_LEVELS or ai_placement not in AI_PLACEMENTS:
+            logger.error("Invalid difficulty or AI placement")
+            return jsonify({'message': 'Invalid difficulty or AI placement'}), 400
+        DIFFICULTY = difficulty
+        AI_PLACEMENT = ai_placement
+        user_fleet = dict(user_ships)
+        #a new placement is a new board for the AI to attack
+        previous_coords = AttackedCells(10)
+        ai_hits = {}
         user_board = initialise_board(10)
         logger.info("User board initialised")
         #this returns a dictionary of the placement
         PLACEMENT = request.get_json()
         #places the ships on the board
         user_board = custom_placement(user_board, user_ships)
+        #the player's board changed, so the previous state (and its ETag) no longer applies
+        GAME_STATE.reset()
         logger.info("User board placement received")
         return jsonify({'message': 'Received'}), 200
     return jsonify({'message': 'Invalid request method'}), 400
@@ -114,13 +149,15 @@ def root():
     Handles GET requests to the root URL. 
 
     This function initializes the AI's game board and battleships, 
-    places the battleships on the board using a set algorithm, 
+    places the battleships on the board using the algorithm chosen at placement ('random' by default), 
     and then renders the main HTML template with the user's game board.
 
     Global variables:
     user_board: 2D list representing the user's game board
     ai_board: 2D list representing the AI's game board
     ai_ships: Dictionary representing the AI's battleships
+    previous_coords: AttackedCells of the AI's attacks, emptied for the new game
+    ai_hits: Dictionary of the AI's hits, emptied for the new game
 
     Returns:
     Rendered 'main.html' template with the user's game board.
@@ -128,19 +165,26 @@ def root():
     global user_board
     global ai_board
     global ai_ships
+    global previous_coords
+    global ai_hits
     if request.method == 'GET':
-        #initialise board, and placing ships randomly on the board
+        #initialise board, and placing ships on the board with the chosen algorithm
         ai_board = initialise_board(10)
         ai_ships = create_battleships()
-        ai_board = place_battleships(ai_board, ai_ships, algorithm='random')
-        logger.info("AI board initialised and ships placed randomly")
+        ai_board = place_battleships(ai_board, ai_ships, algorithm=AI_PLACEMENT)
+        logger.info("AI board initialised and ships placed with %s algorithm", AI_PLACEMENT)
+        #a new AI board is a new game, so the state versions start again
+        GAME_STATE.reset()
+        #the AI's previous attacks belong to the last game, otherwise it runs out of coordinates to attack
+        previous_coords = AttackedCells(10)
+        ai_hits = {}
         #return main.html with get request
         logger.info("main template rendered")
         return render_template('main.html', player_board = user_board)
     logger.error("Invalid request method in placement_interface")
     return jsonify({'message': 'Invalid request method'}), 400
 
-previous_coords = []  
+previous_coords = AttackedCells(10)
 @app.route('/attack', methods=['GET'])
 def process_attack():
     """
@@ -148,21 +192,24 @@ def process_attack():
 
     This function processes the user's attack and the AI's counterattack. 
     It gets the coordinates of the user's attack from the request, 
-    performs the attack, generates the AI's attack, performs the AI's attack, and checks if the game has ended.
-    If the AI hits a ship, it appends the coordinates to the 'previous_coords' list. 
-    If the game has ended, it returns a JSON response indicating who won. 
-    If the user hit a ship, it returns a JSON response indicating that the user hit a ship and the coordinates of the AI's attack. 
-    If the user missed, it returns a JSON response indicating that the user missed and the coordinates of the AI's attack.
+    performs the attack, generates the AI's attack at the game's difficulty within its time budget, performs the AI's attack,
+    and checks if the game has ended.
+    The AI's attacks are appended to the 'previous_coords' list.
+    Every move is recorded in GAME_STATE and the response carries its delta (changed cells, sunk ships and the new version),
+    so the front end only has to apply what changed.
+    If the game has ended, the response also indicates who won.
 
     Global variables:
     user_board: 2D list representing the user's game board
     ai_board: 2D list representing the AI's game board
     ai_ships: Dictionary representing the AI's battleships
     user_ships: Dictionary representing the user's battleships
-    previous_coords: List of coordinates of the AI's successful attacks
+    previous_coords: AttackedCells of the AI's attacks
+    ai_hits: Dictionary of the AI's hits on the user's ships
 
     Returns:
-    JSON response with the result of the user's attack, the coordinates of the AI's attack, and possibly the result of the game.
+    JSON response with the result of the user's attack, the coordinates of the AI's attack,
+    the delta of the move and possibly the result of the game.
     """
     global previous_coords
     global user_board
@@ -175,28 +222,73 @@ def process_attack():
         y = request.args.get('y')
         coordinates_on_screen = (x,y)
         logger.info("User attack coordinates received")
-        #coordinates_on_screen used for user attack on AI board
-        user_attack = attack(coordinates_on_screen, ai_board, ai_ships)
         length = len(user_board)
-        #ai_cords generated for AI attack on user board
-        ai_cords = generate_attack(length, previous_coords) 
+        #the AI has nothing left to attack, so nothing is played
+        if previous_coords.remaining() == 0:
+            logger.error("No coordinates left for the AI to attack")
+            return jsonify({'message': 'No coordinates left for the AI to attack'}), 400
+        #coordinates_on_screen used for user attack on AI board
+        user_attack, user_cell, ai_sunk = tracked_attack(coordinates_on_screen, ai_board, ai_ships)
+        #ai_cords generated for AI attack on user board, from its hits on ships still afloat
+        open_hits = [cell for cell, ship_name in ai_hits.items() if user_ships.get(ship_name, 0) > 0]
+        remaining_ships = [user_fleet[ship_name] for ship_name, ship_size in user_ships.items()
+                           if ship_size > 0 and ship_name in user_fleet]
+        ai_cords = choose_attack(DIFFICULTY, length, previous_coords, open_hits, remaining_ships)
         x2, y2 = ai_cords
-        attack(ai_cords, user_board, user_ships)
+        ship_name = user_board[x2][y2]
+        ai_attack, ai_cell, user_sunk = tracked_attack(ai_cords, user_board, user_ships)
+        if ai_attack is True:
+            ai_hits[ai_cell] = ship_name
         #check if game has ended
+        finished = None
         if end_game_check(ai_ships):
             logger.info("User wins")
-            return jsonify({'hit': True, 'AI_Turn': (x2,y2), 'finished': 'You win! woo woo'})
+            finished = 'You win! woo woo'
         elif end_game_check(user_ships):
             logger.info("AI wins")
-            return jsonify({'hit': True, 'AI_Turn': (x2,y2), 'finished': 'AI wins, boo boo'})  
+            finished = 'AI wins, boo boo'
+        sunk = [(board, ship) for board, ship in (('ai', ai_sunk), ('player', user_sunk)) if ship is not None]
+        delta = GAME_STATE.record_move([('ai', user_cell, user_attack), ('player', ai_cell, ai_attack)], sunk, finished)
+        response = {'hit': user_attack, 'AI_Turn': (x2,y2), 'version': delta['version'],
+                    'changes': delta['changes'], 'sunk': delta['sunk']}
+        if finished is not None:
+            response['hit'] = True
+            response['finished'] = finished
         elif user_attack is True:
             logger.info("AI hit a ship")
-            return jsonify({'hit': True, 'AI_Turn': (x2,y2)})
-        logger.info("AI missed")
-        return jsonify({'hit': False, 'AI_Turn': (x2,y2)})
+        else:
+            logger.info("AI missed")
+        return jsonify(response)
     logger.error("Invalid request method in process_attack")
     return jsonify({'message': 'Failed'}), 200
 
+@app.route('/state', methods=['GET'])
+def game_state():
+    """
+    Handles GET requests to the '/state' URL.
+
+    With a 'since' argument (a version the client already has), it returns only the deltas recorded after that version,
+    so a client can resync cheaply after a reconnect.
+    If 'since' is missing, invalid or too old, it returns the full state of the game with an ETag,
+    and answers 304 Not Modified when the client's If-None-Match still matches.
+
+    Global variables:
+    user_board: 2D list representing the user's game board
+
+    Returns:
+    JSON response with the deltas or the full state of the game.
+    """
+    since = request.args.get('since')
+    if since is not None and since.lstrip('-').isdigit():
+        deltas = GAME_STATE.deltas_since(int(since))
+        if deltas is not None:
+            logger.info("State deltas since version %s sent", since)
+            return jsonify({'game_id': GAME_STATE.game_id, 'version': GAME_STATE.version, 'deltas': deltas})
+    response = jsonify(GAME_STATE.full_state(user_board))
+    response.set_etag(GAME_STATE.etag())
+    logger.info("Full state sent")
+    return response.make_conditional(request)
+
 if __name__ == "__main__":
     app.template_folder = 'templates'
     app.run(debug=True)
\ No newline at end of file
@@ -4,10 +4,14 @@ It includes functions to initialize the game board, create and place battleships
 process player input, and handle the game logic for player and AI attacks. It also 
 includes a function to generate random attack coordinates for the AI.
 """
+import argparse
 import random
+import sys
 from log_config import logger
 from components import initialise_board, create_battleships, place_battleships, process_coordinates, end_game_check
 from game_engine import attack, cli_coordinates_input
+from board_renderer import BoardRenderer, SpectatorStream
+from ai_difficulty import choose_attack, AttackedCells, DEFAULT_TIME_BUDGET
 
 players = {}
 def generate_attack(boardsize, previous_coordinates):
@@ -35,36 +39,43 @@ def generate_attack(boardsize, previous_coordinates):
             # Return the coordinates
             return coordinates
 
-def ai_opponent_game_loop():
+def ai_opponent_game_loop(difficulty='easy', player_placement='custom', ai_placement='random', time_budget=None):
     """
     This function runs the main game loop for a battleship game against an AI opponent.
 
     The function first initializes the game boards and ships for both the player and the AI. 
-    The player's ships are placed according to a custom algorithm, while the AI's ships are placed randomly.
+    The player's ships are placed according to player_placement ('custom' by default), the AI's ships according to ai_placement ('random' by default).
 
     The game then enters a loop where the player and the AI take turns attacking each other's ships. 
-    The player inputs their attack coordinates, and the AI generates its attack coordinates randomly. 
-    If an attack hits a ship, the corresponding cell on the game board is marked with an 'X'. 
-    If an attack misses, the cell is marked with an 'O'. 
+    The player inputs their attack coordinates, and the AI generates its attack coordinates according to the difficulty, within the time budget. 
+    If an AI attack hits a ship, the cell is marked with an 'X' in the renderer's overlay, if it misses with an 'O'.
+    The markers are kept out of the board itself, so they do not affect the game.
     The game continues until all ships of a player are destroyed.
 
-    After each turn, the function prints the current state of the player's game board. 
+    After each turn, the function prints the current state of the player's game board, only the changed rows are rendered again. 
     When the game ends, the function prints a message indicating whether the player won or lost.
 
     Parameters:
-    None
+    difficulty (str, optional): The AI's difficulty, 'easy', 'medium' or 'hard'. Defaults to 'easy'.
+    player_placement (str, optional): The placement algorithm of the player's ships. Defaults to 'custom'.
+    ai_placement (str, optional): The placement algorithm of the AI's ships. Defaults to 'random'.
+    time_budget (float, optional): Seconds each AI move may take. Defaults to DEFAULT_TIME_BUDGET of ai_difficulty.
 
     Returns:
     None
     """
+    time_budget = DEFAULT_TIME_BUDGET if time_budget is None else time_budget
     #arrays to store the coordinates that have already been attacked by the player and the AI.
     try:
         player1_coordinates_attempts = []
-        ai_coordinates_attempts = []
+    #the AI's hits on the player's ships, by coordinates
+        ai_hits = {}
     #welcome message as per requirement but asking for name as a extra bit.
         player1 = input("Welcome to Suraj's Battleship Game, please enter your name: ")
     #Prompy for the board size
         sizeboard = int(input(f"Hello {player1}, enter the size of the board: "))
+    #the AI's attacks are kept with the cells it has left, so its moves do not slow down as the board grows
+        ai_coordinates_attempts = AttackedCells(sizeboard)
     except ValueError as e:
         logger.error('Invalid input: %s', e)
         return
@@ -75,26 +86,35 @@ def ai_opponent_game_loop():
         logger.info('player board initialised')
         player1_ships = create_battleships()
         logger.info('player ships created')
-        place_battleships(player1_gameboard, player1_ships, algorithm='custom')
+        player1_fleet = dict(player1_ships)
+        place_battleships(player1_gameboard, player1_ships, algorithm=player_placement)
         logger.info('player ships placed')
     #Initialising the board and the boats for the AI and placing them randomly.
         ai_gameboard = initialise_board(sizeboard)
         logger.info('AI board initialised')
         ai_ships = create_battleships()
         logger.info('AI ships created')
-        place_battleships(ai_gameboard, ai_ships, algorithm='random')
+        place_battleships(ai_gameboard, ai_ships, algorithm=ai_placement)
         logger.info('AI ships placed')
     #Initialising both players in the dictionary created above 
         players[player1] =  {"board": player1_gameboard,  "battleships": player1_ships}
         logger.info('player added to players dictionary')
         players["AI"] = {"board": ai_gameboard, "battleships": ai_ships}
         logger.info('AI added to players dictionary')
+    #renders the player's board with the AI's hits and misses on top of it
+        player1_renderer = BoardRenderer(player1_gameboard)
     except ValueError as ve:
         logger.error('ValueError occurred: %s', ve)
         return
     except TypeError as te:
         logger.error('TypeError occurred: %s', te)
         return
+    #the board stays at the top of a terminal and only its changed rows are written again,
+    #when the output is not a terminal the changed rows are printed as 'row:text' lines
+    board_stream = SpectatorStream(player1_renderer, sys.stdout, ansi=sys.stdout.isatty())
+    if board_stream.ansi:
+        board_stream.pin()
+    board_stream.write()
     #Looping until one of the player has no ships left.
     while end_game_check(player1_ships) is False and end_game_check(ai_ships) is False:
     #Player 1's turn, fetching the coordinates using cli_coordinates_input() & checking validity through process_coordinates().
@@ -111,27 +131,27 @@ def ai_opponent_game_loop():
         else:
             print("That was a miss, let's try again!")
             logger.info('player miss')  
-    #Ai's turn, generating and checking the coordinates for the attack using generate_attack_ai().
-        ai_attack_cords = generate_attack(sizeboard, ai_coordinates_attempts)
+    #Ai's turn, generating the coordinates for the attack with choose_attack() at the chosen difficulty.
+        open_hits = [cell for cell, ship_name in ai_hits.items() if player1_ships[ship_name] > 0]
+        remaining_ships = [player1_fleet[ship_name] for ship_name, ship_size in player1_ships.items() if ship_size > 0]
+        ai_attack_cords = choose_attack(difficulty, sizeboard, ai_coordinates_attempts, open_hits, remaining_ships, time_budget)
         x, y = ai_attack_cords
-        #To return the ascii representation of the board, after every AI attack.
-        while player1_gameboard[x][y] == ' [O] ' or player1_gameboard[x][y] == ' [X] ':
-    #If the generated coordinates have already been attacked, generate new ones
-            ai_attack_cords = generate_attack(sizeboard, ai_coordinates_attempts)
-            x, y = ai_attack_cords
+        ship_name = player1_gameboard[x][y]
         ai_attack = attack(ai_attack_cords, player1_gameboard, player1_ships)
-    #If the attack is true, the AI has hit a ship, if not, the AI has missed and prints the ascii representation on the playerboard acccordigly.
         if ai_attack is True:
-            player1_gameboard[x][y] = ' [X] '
+            ai_hits[ai_attack_cords] = ship_name
+    #If the attack is true, the AI has hit a ship, if not, the AI has missed and marks the overlay of the playerboard acccordigly.
+        player1_renderer.mark(x, y, ai_attack)
+        if ai_attack is True:
             logger.info('AI hit')
             print("Hit, Guess what? i can see where the ships are :)")
         else:
-            player1_gameboard[x][y]= ' [O] '
             logger.info('AI miss')
             print("and missed, trust me just going easy on you!")
-    #Joining the list of lists to print the ascii representation of the board.
-        representation = '\n'.join(['  '.join('  ' if cell is None else cell for cell in row) for row in player1_gameboard])
-        print(representation)
+    #Writing the ascii representation of the board, only the row of the attack is rendered and written again.
+        board_stream.write()
+    if board_stream.ansi:
+        board_stream.unpin()
     #Checking if the game is over and printing the appropriate message.
     if end_game_check(player1_ships):
         logger.info('player1 lost')
@@ -142,7 +162,15 @@ def ai_opponent_game_loop():
 
 
 if __name__ == "__main__":
-    ai_opponent_game_loop()
+    parser = argparse.ArgumentParser(description="Battleship against the AI in the terminal")
+    parser.add_argument('--difficulty', choices=['easy', 'medium', 'hard'], default='easy')
+    parser.add_argument('--placement', choices=['simple', 'random', 'custom', 'diagonal'], default='custom',
+                        help="placement algorithm of your ships")
+    parser.add_argument('--ai-placement', choices=['simple', 'random', 'custom', 'diagonal'], default='random',
+                        help="placement algorithm of the AI's ships")
+    parser.add_argument('--time-budget', type=float, default=None, help="seconds each AI move may take")
+    args = parser.parse_args()
+    ai_opponent_game_loop(args.difficulty, args.placement, args.ai_placement, args.time_budget)
 
 
 
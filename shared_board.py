@@ -0,0 +1,269 @@
+"""
+Shared-memory boards, so worker processes can read and write a game in place
+instead of the board being pickled on every handoff.
+Each game is one multiprocessing.shared_memory block with a fixed layout:
+header, ship names, fleet hit points, board (ship index per cell) and hit mask.
+Processes only exchange the game id and small results.
+"""
+import re
+import struct
+import sys
+from multiprocessing import shared_memory, resource_tracker
+from components import initialise_board, place_battleships, CoordinatesOutOfRange
+from ai_difficulty import choose_attack, AttackedCells, DEFAULT_TIME_BUDGET
+from log_config import logger
+
+MAGIC = b'BSHM'
+HEADER = struct.Struct('<4sii')
+NAME_SIZE = 32
+#hit mask values
+UNKNOWN = 0
+MISS = 1
+HIT = 2
+#finds the attacked cells of a hit mask, the scan runs in C instead of a Python loop over every cell
+ATTACKED = re.compile(rb'[^\x00]')
+
+def block_name(game_id):
+    """
+    Returns the name of the shared memory block of a game.
+    """
+    return f"battleship_{game_id}"
+
+def block_size(board_size, ship_count):
+    """
+    Returns the number of bytes of a game's block: header, names, hit points (int32), board and hit mask.
+    """
+    return HEADER.size + ship_count * (NAME_SIZE + 4) + 2 * board_size * board_size
+
+class SharedBoard:
+    """
+    A game board in a shared memory block, created by the web process and attached by workers.
+
+    Only one process should write to a game at a time, the web process hands the game over with its id.
+    """
+    def __init__(self, game_id, shm, owner):
+        self.game_id = game_id
+        self.shm = shm
+        self.owner = owner
+        magic, self.board_size, ship_count = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC:
+            shm.close()
+            raise ValueError(f"{shm.name} is not a shared board")
+        names_end = HEADER.size + ship_count * NAME_SIZE
+        self.ship_names = [bytes(shm.buf[offset:offset + NAME_SIZE]).rstrip(b'\0').decode('utf-8')
+                           for offset in range(HEADER.size, names_end, NAME_SIZE)]
+        self.ship_index = {ship_name: i for i, ship_name in enumerate(self.ship_names)}
+        cells = self.board_size * self.board_size
+        self.hit_points = shm.buf[names_end:names_end + ship_count * 4].cast('i')
+        self.cells = shm.buf[names_end + ship_count * 4:names_end + ship_count * 4 + cells]
+        self.hit_mask = shm.buf[names_end + ship_count * 4 + cells:names_end + ship_count * 4 + 2 * cells]
+
+    @classmethod
+    def create(cls, game_id, board_size, ships):
+        """
+        Creates an empty board block for a game, the caller owns it and has to unlink() it.
+
+        Parameters:
+        game_id (str): The id of the game.
+        board_size (int): The size of the board.
+        ships (dict): Ship names and sizes, names must fit in 32 bytes and there can be at most 255 ships.
+
+        Raises:
+        ValueError: If a ship name is too long or there are too many ships.
+        """
+        if len(ships) > 255 or any(len(ship_name.encode('utf-8')) > NAME_SIZE for ship_name in ships):
+            logger.error("Ships do not fit in a shared board")
+            raise ValueError("at most 255 ships with names of up to 32 bytes")
+        shm = shared_memory.SharedMemory(name=block_name(game_id), create=True, size=block_size(board_size, len(ships)))
+        HEADER.pack_into(shm.buf, 0, MAGIC, board_size, len(ships))
+        for i, ship_name in enumerate(ships):
+            encoded = ship_name.encode('utf-8')
+            offset = HEADER.size + i * NAME_SIZE
+            shm.buf[offset:offset + len(encoded)] = encoded
+        board = cls(game_id, shm, owner=True)
+        for i, ship_size in enumerate(ships.values()):
+            board.hit_points[i] = int(ship_size)
+        logger.info("Shared board created for game %s", game_id)
+        return board
+
+    @classmethod
+    def attach(cls, game_id):
+        """
+        Attaches to the board block of a game created by another process.
+        """
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=block_name(game_id), track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=block_name(game_id))
+            #the creator unlinks the block, the resource tracker must not unlink it when this process exits
+            resource_tracker.unregister(shm._name, 'shared_memory')  # pylint: disable=protected-access
+        return cls(game_id, shm, owner=False)
+
+    def write_board(self, board):
+        """
+        Writes a board (2D list of ship names or None) into the block and clears the hit mask.
+        """
+        for x, row in enumerate(board):
+            offset = x * self.board_size
+            self.cells[offset:offset + self.board_size] = bytes(
+                0 if ship_name is None else self.ship_index[ship_name] + 1 for ship_name in row)
+        self.hit_mask[:] = bytes(len(self.hit_mask))
+
+    def to_board(self):
+        """
+        Returns the board as the game's 2D list, hit cells are None like after attack().
+        """
+        board = initialise_board(self.board_size)
+        for index, ship in enumerate(self.cells):
+            if ship and self.hit_mask[index] != HIT:
+                board[index // self.board_size][index % self.board_size] = self.ship_names[ship - 1]
+        return board
+
+    def ships(self):
+        """
+        Returns the fleet as the game's dictionary of ship names and remaining hit points.
+        """
+        return {ship_name: self.hit_points[i] for i, ship_name in enumerate(self.ship_names)}
+
+    def attacked_cells(self):
+        """
+        Returns the list of attacked (x, y) coordinates.
+        """
+        return [divmod(match.start(), self.board_size) for match in ATTACKED.finditer(self.hit_mask)]
+
+    def attack_history(self):
+        """
+        Returns what the AI needs for its next move, from one scan of the hit mask:
+        an AttackedCells of the attacked cells, the hits on ships not sunk yet and the sizes of those ships.
+        """
+        attacked = AttackedCells(self.board_size)
+        open_hits = []
+        hits = [0] * len(self.ship_names)
+        for match in ATTACKED.finditer(self.hit_mask):
+            index = match.start()
+            cell = divmod(index, self.board_size)
+            attacked.append(cell)
+            if self.hit_mask[index] == HIT:
+                ship = self.cells[index] - 1
+                hits[ship] = hits[ship] + 1
+                if self.hit_points[ship] > 0:
+                    open_hits.append(cell)
+        #a ship's size is what is left of it plus its hit cells
+        remaining_ships = [self.hit_points[i] + hits[i] for i in range(len(self.ship_names)) if self.hit_points[i] > 0]
+        return attacked, open_hits, remaining_ships
+
+    def attack(self, x, y):
+        """
+        Attacks (x, y) in place, same rules as attack() in game_engine.
+
+        Returns:
+        tuple: (hit, sunk), sunk being the name of the ship sunk by this attack or None.
+
+        Raises:
+        CoordinatesOutOfRange: If (x, y) is not on the board.
+        """
+        if not (0 <= x < self.board_size and 0 <= y < self.board_size):
+            logger.error("Attack on %s out of the shared board of game %s", (x, y), self.game_id)
+            raise CoordinatesOutOfRange("coordinates are not within the board size")
+        index = x * self.board_size + y
+        ship = self.cells[index]
+        if not ship or self.hit_mask[index] == HIT:
+            if self.hit_mask[index] == UNKNOWN:
+                self.hit_mask[index] = MISS
+            return False, None
+        self.hit_mask[index] = HIT
+        self.hit_points[ship - 1] = self.hit_points[ship - 1] - 1
+        if self.hit_points[ship - 1] == 0:
+            return True, self.ship_names[ship - 1]
+        return True, None
+
+    def close(self):
+        """
+        Releases the views and closes the block in this process.
+        """
+        for view in (self.hit_points, self.cells, self.hit_mask):
+            view.release()
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Closes and frees the block, only the owner should call it.
+        """
+        if sys.version_info < (3, 13):
+            #workers forked from this process share its resource tracker, so attaching there unregistered the block,
+            #registering it again keeps the tracker from failing when unlink() unregisters it
+            resource_tracker.register(self.shm._name, 'shared_memory')  # pylint: disable=protected-access
+        self.close()
+        self.shm.unlink()
+        logger.info("Shared board of game %s freed", self.game_id)
+
+class SharedBoardStore:
+    """
+    Keeps the shared boards created by the web process, by game id.
+    """
+    def __init__(self):
+        self.boards = {}
+
+    def create(self, game_id, board_size, ships):
+        """
+        Creates the board block of a game and returns its SharedBoard.
+        """
+        board = SharedBoard.create(game_id, board_size, ships)
+        self.boards[game_id] = board
+        return board
+
+    def get(self, game_id):
+        """
+        Returns the SharedBoard of a game, None if there is none.
+        """
+        return self.boards.get(game_id)
+
+    def release(self, game_id):
+        """
+        Frees the block of a finished game.
+        """
+        board = self.boards.pop(game_id, None)
+        if board is not None:
+            board.unlink()
+
+    def close_all(self):
+        """
+        Frees every block, to be called when the web process stops.
+        """
+        for game_id in list(self.boards):
+            self.release(game_id)
+
+def generate_board_worker(game_id, ships, algorithm='random'):
+    """
+    Worker task: places the ships with place_battleships and writes the board into the game's block.
+
+    Returns:
+    str: The game id.
+    """
+    board = SharedBoard.attach(game_id)
+    try:
+        local_board = initialise_board(board.board_size)
+        place_battleships(local_board, dict(ships), algorithm=algorithm)
+        board.write_board(local_board)
+    finally:
+        board.close()
+    return game_id
+
+def ai_move_worker(game_id, difficulty='easy', time_budget=DEFAULT_TIME_BUDGET):
+    """
+    Worker task: generates the AI's attack at a difficulty of ai_difficulty on the game's board and applies it in place.
+
+    Returns:
+    tuple: (game_id, coordinates, hit, sunk).
+
+    Raises:
+    ValueError: If every cell of the board has been attacked, or the difficulty is invalid.
+    """
+    board = SharedBoard.attach(game_id)
+    try:
+        attacked, open_hits, remaining_ships = board.attack_history()
+        coordinates = choose_attack(difficulty, board.board_size, attacked, open_hits, remaining_ships, time_budget)
+        hit, sunk = board.attack(*coordinates)
+    finally:
+        board.close()
+    return game_id, coordinates, hit, sunk
@@ -0,0 +1,344 @@
+"""
+Tournament runner for AI strategies.
+Every entrant is an attack strategy plus a placement algorithm ('random', 'diagonal', 'custom'),
+matches are scheduled as a round-robin or a Swiss bracket and played headless across a process pool.
+Results are checkpointed in a SQLite file as they come in, so a stopped run resumes where it was,
+and Elo ratings and win rates (with 95% confidence intervals) are written to the same file.
+
+Usage: python tournament.py --format round-robin --games-per-pair 100 --workers 8 --db tournament.sqlite
+"""
+import argparse
+import contextlib
+import hashlib
+import logging
+import math
+import os
+import random
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from components import initialise_board, create_battleships, place_battleships, end_game_check, PlacementError, CoordinatesOutOfRange
+from game_engine import attack
+from ai_difficulty import ATTACK_STRATEGIES, AttackedCells
+from log_config import logger
+
+PLACEMENT_ALGORITHMS = ('random', 'diagonal', 'custom')
+
+def play_match(match):
+    """
+    Plays one headless game between two entrants.
+
+    Parameters:
+    match (tuple): (match_id, entrant_a, entrant_b, seed, first, board_size, ships, move_samples),
+    entrants being 'strategy/placement', first 0 if entrant_a starts and 1 if entrant_b does,
+    and move_samples the most placements the density strategy may sample per move.
+
+    Returns:
+    tuple: (match_id, winner, moves), winner being entrant_a, entrant_b or None if the match is void:
+    a fleet could not be (fully) placed, so one side could never lose, or a side ran out of cells to attack.
+    """
+    match_id, entrant_a, entrant_b, seed, first, board_size, ships, move_samples = match
+    random.seed(seed)
+    sides = []
+    for entrant in (entrant_a, entrant_b):
+        strategy, algorithm = entrant.split('/')
+        board = initialise_board(board_size)
+        fleet = dict(ships)
+        try:
+            placed = place_battleships(board, fleet, algorithm=algorithm)
+        except (PlacementError, CoordinatesOutOfRange):
+            placed = None
+        #a fleet with ships left off the board could never be sunk
+        if placed is None or sum(cell is not None for row in board for cell in row) != sum(ships.values()):
+            logger.warning("Match %s void, %s could not place its whole fleet", match_id, entrant)
+            return match_id, None, 0
+        sides.append({'name': entrant, 'strategy': ATTACK_STRATEGIES[strategy], 'board': board, 'ships': fleet,
+                      'attacked': AttackedCells(board_size), 'hits': {}})
+    turn = first
+    moves = 0
+    while True:
+        attacker, defender = sides[turn], sides[1 - turn]
+        open_hits = [cell for cell, ship_name in attacker['hits'].items() if defender['ships'][ship_name] > 0]
+        remaining_ships = [ships[ship_name] for ship_name, ship_size in defender['ships'].items() if ship_size > 0]
+        try:
+            #no deadline: moves are capped by samples, not time, so a re-run replays the same games
+            x, y = attacker['strategy'](board_size, attacker['attacked'], open_hits, remaining_ships, None, move_samples)
+        except ValueError:
+            #every cell was attacked and the game is not over, so it can not be finished
+            logger.warning("Match %s void, %s has no cells left to attack", match_id, attacker['name'])
+            return match_id, None, moves
+        ship_name = defender['board'][x][y]
+        if attack((x, y), defender['board'], defender['ships']):
+            attacker['hits'][(x, y)] = ship_name
+        moves = moves + 1
+        if end_game_check(defender['ships']):
+            return match_id, attacker['name'], moves
+        turn = 1 - turn
+
+def play_matches(matches):
+    """
+    Plays a chunk of matches in one worker and returns their results, to keep the pool's overhead per match low.
+    """
+    return [play_match(match) for match in matches]
+
+def quiet_worker():
+    """
+    Process pool initializer, silences the game's prints and info logs so they do not slow down the workers.
+    """
+    logger.setLevel(logging.WARNING)
+    sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+def open_results(filename):
+    """
+    Opens (and creates if needed) the SQLite results file.
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute("""CREATE TABLE IF NOT EXISTS matches (
+        match_id TEXT PRIMARY KEY, tournament TEXT, round INTEGER, entrant_a TEXT, entrant_b TEXT,
+        seed INTEGER, winner TEXT, moves INTEGER)""")
+    connection.execute("""CREATE TABLE IF NOT EXISTS ratings (
+        tournament TEXT, entrant TEXT, elo REAL, games INTEGER, wins INTEGER,
+        win_rate REAL, ci_low REAL, ci_high REAL, PRIMARY KEY (tournament, entrant))""")
+    connection.commit()
+    return connection
+
+def match_seed(match_id):
+    """
+    Returns a seed that only depends on the match id, so a resumed run plays the same games.
+    """
+    return int.from_bytes(hashlib.sha256(match_id.encode('utf-8')).digest()[:4], 'little')
+
+def round_robin(tournament, entrants, games_per_pair):
+    """
+    Returns the matches of a round-robin as (match_id, round, entrant_a, entrant_b, game),
+    every pair playing games_per_pair games.
+    """
+    matches = []
+    for game in range(games_per_pair):
+        for i, entrant_a in enumerate(entrants):
+            for entrant_b in entrants[i + 1:]:
+                matches.append((f"{tournament}:{entrant_a}:{entrant_b}:{game}", 0, entrant_a, entrant_b, game))
+    return matches
+
+def swiss_round(tournament, round_number, entrants, results, games_per_pair):
+    """
+    Returns the matches of one Swiss round, pairing entrants with close scores that have not met yet.
+
+    Parameters:
+    results (list): (entrant_a, entrant_b, winner) of the previous rounds.
+    """
+    scores = {entrant: 0.0 for entrant in entrants}
+    met = set()
+    for entrant_a, entrant_b, winner in results:
+        met.add(frozenset((entrant_a, entrant_b)))
+        if winner in scores:
+            scores[winner] = scores[winner] + 1
+    #sorting by name first makes the pairings the same when a run is resumed
+    waiting = sorted(sorted(entrants), key=lambda entrant: -scores[entrant])
+    matches = []
+    while len(waiting) > 1:
+        entrant_a = waiting.pop(0)
+        opponent = next((entrant for entrant in waiting if frozenset((entrant_a, entrant)) not in met), waiting[0])
+        waiting.remove(opponent)
+        for game in range(games_per_pair):
+            matches.append((f"{tournament}:r{round_number}:{entrant_a}:{opponent}:{game}", round_number, entrant_a, opponent,
+                            game))
+    #with an odd number of entrants the last one sits the round out
+    return matches
+
+def run_matches(connection, tournament, matches, board_size, ships, workers, move_samples, batch_size=500):
+    """
+    Plays the matches that are not in the results file yet across the process pool, saving results in batches.
+
+    Matches are sent to the workers in chunks, with only a few chunks per worker in flight at a time,
+    and results are saved in the order they finish, so memory stays flat and a slow match does not hold up the checkpoints.
+    The entrants take turns to start, game by game, so neither gets the first move in all of a pair's games.
+
+    Returns:
+    int: The number of matches played.
+    """
+    done = {row[0] for row in connection.execute("SELECT match_id FROM matches WHERE tournament = ?", (tournament,))}
+    pending = [match for match in matches if match[0] not in done]
+    if not pending:
+        return 0
+    details = {match[0]: match for match in pending}
+    logger.info("%s matches to play, %s already in the results", len(pending), len(done))
+    chunk_size = max(1, min(batch_size, len(pending) // (workers * 16)))
+    chunks = ([(match_id, entrant_a, entrant_b, match_seed(match_id), game % 2, board_size, ships, move_samples)
+               for match_id, _, entrant_a, entrant_b, game in pending[start:start + chunk_size]]
+              for start in range(0, len(pending), chunk_size))
+    batch = []
+    running = set()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=quiet_worker) as pool:
+            for chunk in chunks:
+                running.add(pool.submit(play_matches, chunk))
+                if len(running) < workers * 2:
+                    continue
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                batch = save_finished(connection, tournament, details, finished, batch, batch_size)
+            while running:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                batch = save_finished(connection, tournament, details, finished, batch, batch_size)
+    finally:
+        #the results played so far are kept even if a chunk failed, a re-run resumes after them
+        save_matches(connection, batch)
+    return len(pending)
+
+def save_finished(connection, tournament, details, finished, batch, batch_size):
+    """
+    Adds the results of finished chunks to the batch, saves it once it is full and returns what is left of it.
+    The batch is added to in place, so the results before a failed chunk are still in it.
+    """
+    for future in finished:
+        for match_id, winner, moves in future.result():
+            _, round_number, entrant_a, entrant_b, _ = details[match_id]
+            batch.append((match_id, tournament, round_number, entrant_a, entrant_b, match_seed(match_id), winner, moves))
+    if len(batch) >= batch_size:
+        save_matches(connection, batch)
+        return []
+    return batch
+
+def save_matches(connection, batch):
+    """
+    Saves a batch of match results, this is the checkpoint a stopped run resumes from.
+    """
+    if batch:
+        connection.executemany("INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        connection.commit()
+
+def wilson_interval(wins, games, z=1.96):
+    """
+    Returns the Wilson score interval (low, high) of a win rate, 95% by default.
+    """
+    if games == 0:
+        return 0.0, 0.0
+    rate = wins / games
+    centre = rate + z * z / (2 * games)
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games))
+    denominator = 1 + z * z / games
+    return max(0.0, (centre - margin) / denominator), min(1.0, (centre + margin) / denominator)
+
+def update_ratings(connection, tournament, entrants, k_factor=16.0):
+    """
+    Computes the Elo ratings and win rates from the saved results and writes them to the ratings table.
+    Results are rated by round, game number and match id, not in the order the pool finished them,
+    so the same (or a resumed) tournament always gets the same ratings.
+
+    Returns:
+    list: (entrant, elo, games, wins, win_rate, ci_low, ci_high) sorted by Elo.
+    """
+    elo = {entrant: 1500.0 for entrant in entrants}
+    games = {entrant: 0 for entrant in entrants}
+    wins = {entrant: 0 for entrant in entrants}
+    rows = connection.execute("SELECT round, match_id, entrant_a, entrant_b, winner FROM matches WHERE tournament = ?",
+                              (tournament,)).fetchall()
+    #match ids end with the game number
+    rows.sort(key=lambda row: (row[0], int(row[1].rsplit(':', 1)[1]), row[1]))
+    for _, _, entrant_a, entrant_b, winner in rows:
+        if winner is None:
+            continue
+        for entrant in (entrant_a, entrant_b):
+            elo.setdefault(entrant, 1500.0)
+            games[entrant] = games.get(entrant, 0) + 1
+            wins.setdefault(entrant, 0)
+        wins[winner] = wins[winner] + 1
+        expected_a = 1 / (1 + 10 ** ((elo[entrant_b] - elo[entrant_a]) / 400))
+        score_a = 1.0 if winner == entrant_a else 0.0
+        elo[entrant_a] = elo[entrant_a] + k_factor * (score_a - expected_a)
+        elo[entrant_b] = elo[entrant_b] - k_factor * (score_a - expected_a)
+    table = []
+    for entrant, rating in elo.items():
+        ci_low, ci_high = wilson_interval(wins[entrant], games[entrant])
+        win_rate = wins[entrant] / games[entrant] if games[entrant] else 0.0
+        table.append((entrant, round(rating, 1), games[entrant], wins[entrant], win_rate, ci_low, ci_high))
+    table.sort(key=lambda row: -row[1])
+    connection.executemany("INSERT OR REPLACE INTO ratings VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                           [(tournament,) + row for row in table])
+    connection.commit()
+    return table
+
+def run_tournament(tournament, entrants, bracket='round-robin', rounds=5, games_per_pair=10, board_size=10,
+                   ships=None, workers=None, filename='tournament.sqlite', move_samples=2000):
+    """
+    Runs (or resumes) a tournament and returns the ratings table of update_ratings().
+
+    Parameters:
+    tournament (str): Name of the tournament, results are saved and resumed under it.
+    entrants (list): Entrants as 'strategy/placement', strategy from ATTACK_STRATEGIES and placement from PLACEMENT_ALGORITHMS.
+    bracket (str, optional): 'round-robin' or 'swiss'. Defaults to 'round-robin'.
+    rounds (int, optional): Number of Swiss rounds. Defaults to 5.
+    games_per_pair (int, optional): Games played by every pairing. Defaults to 10.
+    board_size (int, optional): Size of the boards. Defaults to 10.
+    ships (dict, optional): The fleet of both sides. Defaults to create_battleships().
+    workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+    filename (str, optional): The SQLite results file. Defaults to 'tournament.sqlite'.
+    move_samples (int, optional): Most placements 'density' may sample per move. Defaults to 2000.
+
+    Raises:
+    ValueError: If an entrant, the bracket or the fleet is invalid.
+    """
+    for entrant in entrants:
+        strategy, _, algorithm = entrant.partition('/')
+        if strategy not in ATTACK_STRATEGIES or algorithm not in PLACEMENT_ALGORITHMS:
+            logger.error("Invalid entrant %s", entrant)
+            raise ValueError(f"Invalid entrant {entrant}, expected 'strategy/placement'")
+    ships = ships if ships is not None else create_battleships()
+    if not ships:
+        logger.error("No ships to play with")
+        raise ValueError("No ships to play with")
+    workers = workers or os.cpu_count() or 1
+    connection = open_results(filename)
+    try:
+        if bracket == 'round-robin':
+            matches = round_robin(tournament, entrants, games_per_pair)
+            run_matches(connection, tournament, matches, board_size, ships, workers, move_samples)
+        elif bracket == 'swiss':
+            for round_number in range(1, rounds + 1):
+                results = list(connection.execute(
+                    "SELECT entrant_a, entrant_b, winner FROM matches WHERE tournament = ? AND round < ?",
+                    (tournament, round_number)))
+                matches = swiss_round(tournament, round_number, entrants, results, games_per_pair)
+                played = run_matches(connection, tournament, matches, board_size, ships, workers, move_samples)
+                logger.info("Swiss round %s: %s matches played", round_number, played)
+        else:
+            logger.error("Invalid bracket %s", bracket)
+            raise ValueError("Invalid bracket, please enter 'round-robin' or 'swiss'")
+        return update_ratings(connection, tournament, entrants)
+    finally:
+        connection.close()
+
+def default_entrants():
+    """
+    Returns every strategy with every placement algorithm, 'custom' only if placement.json is there.
+    """
+    algorithms = [algorithm for algorithm in PLACEMENT_ALGORITHMS
+                  if algorithm != 'custom' or os.path.exists('placement.json')]
+    return [f"{strategy}/{algorithm}" for strategy in ATTACK_STRATEGIES for algorithm in algorithms]
+
+def main():
+    """
+    Parses the command line, runs the tournament and prints the ratings.
+    """
+    parser = argparse.ArgumentParser(description="Round-robin / Swiss tournament of Battleship AI strategies")
+    parser.add_argument('--name', default='default', help="tournament name, rerun with the same name to resume")
+    parser.add_argument('--format', choices=['round-robin', 'swiss'], default='round-robin')
+    parser.add_argument('--rounds', type=int, default=5, help="number of Swiss rounds")
+    parser.add_argument('--games-per-pair', type=int, default=10)
+    parser.add_argument('--board-size', type=int, default=10)
+    parser.add_argument('--entrants', nargs='+', default=None, help="entrants as strategy/placement, e.g. hunt/diagonal")
+    parser.add_argument('--ships', default='battleships.txt', help="battleships file of the fleet")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--move-samples', type=int, default=2000, help="most placements 'density' samples per move")
+    parser.add_argument('--db', default='tournament.sqlite', help="SQLite results file")
+    args = parser.parse_args()
+    table = run_tournament(args.name, args.entrants or default_entrants(), args.format, args.rounds,
+                           args.games_per_pair, args.board_size, create_battleships(args.ships), args.workers, args.db,
+                           args.move_samples)
+    print(f"{'entrant':<20}{'elo':>8}{'games':>8}{'win rate':>10}  95% CI")
+    for entrant, rating, games, _, win_rate, ci_low, ci_high in table:
+        print(f"{entrant:<20}{rating:>8}{games:>8}{win_rate:>10.3f}  [{ci_low:.3f}, {ci_high:.3f}]")
+
+if __name__ == "__main__":
+    with contextlib.suppress(KeyboardInterrupt):
+        main()